@@ -21,3 +21,7 @@ def missing_env_vars(*keys):
         if value is None or not value.strip():
             missing.append(key)
     return missing
+
+
+# Environment is loaded once above, so the Kite credentials only need checking once
+MISSING_KITE_ENV_VARS = missing_env_vars("KITE_API_KEY", "KITE_ACCESS_TOKEN")
@@ -0,0 +1,40 @@
+"""Shared file helpers for zerodha_bot."""
+
+import functools
+import os
+import tempfile
+
+import orjson
+
+
+@functools.lru_cache(maxsize=8)
+def _load_json_cached(path_str, mtime_ns, size):
+    with open(path_str, "rb") as file_obj:
+        return orjson.loads(file_obj.read())
+
+
+def load_json_file(path):
+    """Parse a JSON file, reusing the previous result until the file changes on disk."""
+    stat = path.stat()
+    return _load_json_cached(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def file_signature(path):
+    """Return (st_mtime_ns, st_size) for change detection, or None if the file does not exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def write_bytes_atomic(path, data):
+    """Write data to a temp file next to path and swap it in, so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file_obj:
+            file_obj.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
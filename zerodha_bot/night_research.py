@@ -1,13 +1,18 @@
 import datetime
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-import pandas as pd
+import joblib
+import numpy as np
 import yfinance as yf
-from sklearn.ensemble import RandomForestClassifier
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.ensemble import HistGradientBoostingClassifier
 
 BASE_DIR = Path(__file__).resolve().parent
 
+LAGS = 5
+
 # List of NIFTY 50 symbols (Yahoo Finance format with .NS suffix)
 SYMBOLS = [
     "RELIANCE.NS", "TCS.NS", "INFY.NS", "HDFCBANK.NS", "ICICIBANK.NS", "SBIN.NS", "HDFC.NS",
@@ -21,36 +26,80 @@ SYMBOLS = [
 ]
 
 
-def fetch_symbol_data(symbol):
-    data = yf.download(symbol, period="1y", interval="1d", progress=False)
-    data.dropna(inplace=True)
-    if data.empty:
+DOWNLOAD_WORKERS = 10
+
+
+def prepare_symbol_data(data):
+    """Return (daily_returns, volatility) from a price frame, or (None, 0.0) if it has no closes."""
+    # Single-ticker downloads return a one-column frame, so flatten to 1-D
+    close = data["Close"].to_numpy(dtype=float).ravel()
+    missing = np.isnan(close)
+    if missing.any():
+        close = close[~missing]
+    if len(close) < 2:
         return None, 0.0
 
-    data["Return"] = data["Close"].pct_change()
-    volatility = data["Return"].std()
-    if pd.isna(volatility):
+    returns = np.diff(close) / close[:-1]
+    volatility = float(np.nanstd(returns, ddof=1)) if len(returns) > 1 else 0.0
+    if np.isnan(volatility):
         volatility = 0.0
-    return data, float(volatility)
+    return returns, volatility
+
+
+def fetch_symbol_data(symbol):
+    data = yf.download(symbol, period="1y", interval="1d", progress=False)
+    return prepare_symbol_data(data)
+
+
+def fetch_all_symbol_data(symbols):
+    """Download all symbols in one batched request, retrying failed symbols on a thread pool."""
+    results = {}
+    try:
+        batch = yf.download(
+            symbols,
+            period="1y",
+            interval="1d",
+            group_by="ticker",
+            threads=True,
+            progress=False,
+        )
+        if not batch.empty:
+            downloaded = set(batch.columns.get_level_values(0))
+            for symbol in symbols:
+                if symbol in downloaded:
+                    results[symbol] = prepare_symbol_data(batch[symbol])
+        else:
+            print("Batched download returned no data, retrying per symbol...")
+    except Exception as exc:
+        print(f"Batched download failed, retrying per symbol: {exc}")
+
+    # Symbols missing or empty in the batch get their own download attempt
+    retry = [symbol for symbol in symbols if results.get(symbol, (None, 0.0))[0] is None]
+    if retry:
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+            futures = {executor.submit(fetch_symbol_data, symbol): symbol for symbol in retry}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    results[symbol] = future.result()
+                except Exception as exc:
+                    results[symbol] = (None, 0.0)
+                    print(f"Failed to get data for {symbol}: {exc}")
+    return {symbol: results[symbol] for symbol in symbols}
 
 
 def main():
     volatility = {}
-    historical_data = {}
+    daily_returns = {}
 
     print("Downloading data for NIFTY symbols...")
-    for symbol in SYMBOLS:
-        try:
-            data, vol = fetch_symbol_data(symbol)
-            volatility[symbol] = vol
-            if data is not None:
-                historical_data[symbol] = data
-        except Exception as exc:
-            volatility[symbol] = 0.0
-            print(f"Failed to get data for {symbol}: {exc}")
+    for symbol, (returns, vol) in fetch_all_symbol_data(SYMBOLS).items():
+        volatility[symbol] = vol
+        if returns is not None:
+            daily_returns[symbol] = returns
 
     ranked_symbols = sorted(volatility.items(), key=lambda item: item[1], reverse=True)
-    top_symbols = [symbol for symbol, _ in ranked_symbols if symbol in historical_data][:5]
+    top_symbols = [symbol for symbol, _ in ranked_symbols if symbol in daily_returns][:5]
     print(f"Top 5 volatile symbols: {top_symbols}")
 
     models = {}
@@ -58,33 +107,31 @@ def main():
     today_str = datetime.datetime.now().strftime("%Y-%m-%d")
 
     for symbol in top_symbols:
-        df = historical_data[symbol].copy()
-        if df.empty or len(df) < 10:
+        returns = daily_returns[symbol]
+        if len(returns) < 10:
             continue
 
-        for lag in range(1, 6):
-            df[f"Return_lag{lag}"] = df["Return"].shift(lag)
-
-        df["Target"] = (df["Return"].shift(-1) > 0).astype(int)
-        df.dropna(inplace=True)
-
-        features = [f"Return_lag{lag}" for lag in range(1, 6)]
-        X = df[features]
-        y = df["Target"]
+        # Each window holds LAGS past returns, the current return, then the return being predicted
+        windows = sliding_window_view(returns, LAGS + 2)
+        # Keep the zero-copy view unless some windows have to be dropped
+        invalid = np.isnan(windows).any(axis=1)
+        if invalid.any():
+            windows = windows[~invalid]
+        X = windows[:, :LAGS]
+        y = (windows[:, -1] > 0).astype(int)
 
-        if len(y.unique()) < 2:
+        if len(np.unique(y)) < 2:
             continue
 
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
+        model = HistGradientBoostingClassifier(max_iter=50, max_depth=6, random_state=42)
         model.fit(X, y)
         models[symbol] = model
 
-        pred = model.predict(X.iloc[-1].values.reshape(1, -1))[0]
+        pred = model.predict(returns[-LAGS - 1 : -1].reshape(1, -1))[0]
         if pred == 1:
             predictions.append(symbol.replace(".NS", ""))
 
-    with open(BASE_DIR / "models.pkl", "wb") as file_obj:
-        pd.to_pickle(models, file_obj)
+    joblib.dump(models, BASE_DIR / "models.joblib", compress=3)
 
     output = {"date": today_str, "stocks": predictions}
     with open(BASE_DIR / "predictions.json", "w", encoding="utf-8") as file_obj:
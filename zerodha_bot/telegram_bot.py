@@ -1,15 +1,20 @@
-import json
+import functools
 import logging
+import tempfile
+import threading
 from pathlib import Path
 
-import pandas as pd
+import orjson
 import telebot
 from kiteconnect import KiteConnect
+from openpyxl import Workbook
 
 try:
-    from .config import KITE_ACCESS_TOKEN, KITE_API_KEY, TELEGRAM_TOKEN, missing_env_vars
+    from .config import KITE_ACCESS_TOKEN, KITE_API_KEY, MISSING_KITE_ENV_VARS, TELEGRAM_TOKEN, missing_env_vars
+    from .file_utils import load_json_file, write_bytes_atomic
 except ImportError:  # script execution fallback
-    from config import KITE_ACCESS_TOKEN, KITE_API_KEY, TELEGRAM_TOKEN, missing_env_vars
+    from config import KITE_ACCESS_TOKEN, KITE_API_KEY, MISSING_KITE_ENV_VARS, TELEGRAM_TOKEN, missing_env_vars
+    from file_utils import load_json_file, write_bytes_atomic
 
 BASE_DIR = Path(__file__).resolve().parent
 LOG_DIR = BASE_DIR / "logs"
@@ -17,36 +22,105 @@ EXCLUDE_FILE = BASE_DIR / "excluded.json"
 TRADES_FILE = LOG_DIR / "trades.jsonl"
 APP_LOG_FILE = LOG_DIR / "app.log"
 
+TRADE_COLUMNS = ["timestamp", "symbol", "action", "quantity", "price"]
+
+# Cash-flow direction of each trade action for P/L calculation
+TRADE_SIGNS = {"BUY": -1, "SELL": 1}
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Handlers run on a thread pool, so serialize read-modify-write of the exclude list
+EXCLUDE_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=2)
+def _summarize_trades_cached(path_str, mtime_ns, size):
+    total_trades = 0
+    profit = 0.0
+    with open(path_str, "rb") as file_obj:
+        for line in file_obj:
+            if not line.strip():
+                continue
+            trade = orjson.loads(line)
+            total_trades += 1
+            profit += TRADE_SIGNS.get(trade["action"], 0) * trade["price"] * trade["quantity"]
+    return total_trades, profit
+
+
+def summarize_trades():
+    """Return (total_trades, net_profit), streaming the trade log line by line."""
+    stat = TRADES_FILE.stat()
+    return _summarize_trades_cached(str(TRADES_FILE), stat.st_mtime_ns, stat.st_size)
+
+
+def export_trades_xlsx(excel_path):
+    """Stream the trade log into a write-only workbook so memory stays constant."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(TRADE_COLUMNS)
+    with open(TRADES_FILE, "rb") as file_obj:
+        for line in file_obj:
+            if not line.strip():
+                continue
+            trade = orjson.loads(line)
+            sheet.append([trade.get(column) for column in TRADE_COLUMNS])
+    workbook.save(excel_path)
+
 
 def load_excluded():
     try:
-        with open(EXCLUDE_FILE, "r", encoding="utf-8") as file_obj:
-            data = json.load(file_obj)
+        data = load_json_file(EXCLUDE_FILE)
         stocks = data.get("stocks", [])
         return {symbol.strip().upper() for symbol in stocks if isinstance(symbol, str) and symbol.strip()}
     except Exception:
         return set()
 
 
+def tail_lines(path, count, block_size=8192):
+    """Return the last `count` lines of a file, reading only from the end."""
+    size = path.stat().st_size
+    with open(path, "rb") as file_obj:
+        read_size = block_size
+        while True:
+            start = max(0, size - read_size)
+            file_obj.seek(start)
+            data = file_obj.read()
+            lines = data.splitlines(keepends=True)
+            # Drop the first line when it may have been cut by the seek
+            if start > 0:
+                lines = lines[1:]
+            if len(lines) >= count or start == 0:
+                break
+            read_size *= 2
+    return [line.decode("utf-8", "replace") for line in lines[-count:]]
+
+
 def save_excluded(excluded_set):
-    with open(EXCLUDE_FILE, "w", encoding="utf-8") as file_obj:
-        json.dump({"stocks": sorted(excluded_set)}, file_obj, indent=2)
+    write_bytes_atomic(EXCLUDE_FILE, orjson.dumps({"stocks": sorted(excluded_set)}, option=orjson.OPT_INDENT_2))
 
 
 def create_kite_client():
-    missing = missing_env_vars("KITE_API_KEY", "KITE_ACCESS_TOKEN")
-    if missing:
-        raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
+    if MISSING_KITE_ENV_VARS:
+        raise RuntimeError(f"Missing required environment variables: {', '.join(MISSING_KITE_ENV_VARS)}")
 
     kite = KiteConnect(api_key=KITE_API_KEY)
     kite.set_access_token(KITE_ACCESS_TOKEN)
     return kite
 
 
-def register_handlers(bot, kite):
+_kite_client = None
+
+
+def get_kite():
+    """Return the process-wide Kite client, creating it on first use."""
+    global _kite_client
+    if _kite_client is None:
+        _kite_client = create_kite_client()
+    return _kite_client
+
+
+def register_handlers(bot):
     @bot.message_handler(commands=["help"])
     def cmd_help(message):
         help_text = (
@@ -66,7 +140,7 @@ def register_handlers(bot, kite):
     @bot.message_handler(commands=["status"])
     def cmd_status(message):
         try:
-            margins = kite.margins(segment="equity")
+            margins = get_kite().margins(segment="equity")
             net_balance = margins.get("net", None)
             text = f"💰 *Available Margin:* {net_balance}\n\n"
         except Exception:
@@ -74,7 +148,7 @@ def register_handlers(bot, kite):
             return
 
         try:
-            positions = kite.positions().get("net", [])
+            positions = get_kite().positions().get("net", [])
             open_positions = [pos for pos in positions if pos.get("quantity", 0) != 0]
             if open_positions:
                 text += "*Open Positions:*\n"
@@ -93,15 +167,11 @@ def register_handlers(bot, kite):
     @bot.message_handler(commands=["summary"])
     def cmd_summary(message):
         try:
-            df = pd.read_json(TRADES_FILE, lines=True)
-            total_trades = df.shape[0]
-            profit = 0.0
-            for _, row in df.iterrows():
-                if row["action"] == "BUY":
-                    profit -= row["price"] * row["quantity"]
-                elif row["action"] == "SELL":
-                    profit += row["price"] * row["quantity"]
-            text = f"📈 *Trade Summary:*\nTotal Trades: {total_trades}\nNet P/L: {profit:.2f}"
+            total_trades, profit = summarize_trades()
+            if total_trades:
+                text = f"📈 *Trade Summary:*\nTotal Trades: {total_trades}\nNet P/L: {profit:.2f}"
+            else:
+                text = "No trades logged yet."
         except Exception:
             text = "No trades logged yet."
         bot.send_message(message.chat.id, text, parse_mode="Markdown")
@@ -114,14 +184,17 @@ def register_handlers(bot, kite):
             return
 
         symbol = parts[1].strip().upper()
-        excluded = load_excluded()
-        if symbol in excluded:
+        with EXCLUDE_LOCK:
+            excluded = load_excluded()
+            already_excluded = symbol in excluded
+            if not already_excluded:
+                excluded.add(symbol)
+                save_excluded(excluded)
+
+        if already_excluded:
             bot.reply_to(message, f"{symbol} is already excluded.")
-            return
-
-        excluded.add(symbol)
-        save_excluded(excluded)
-        bot.reply_to(message, f"{symbol} has been excluded from trading.")
+        else:
+            bot.reply_to(message, f"{symbol} has been excluded from trading.")
 
     @bot.message_handler(commands=["include"])
     def cmd_include(message):
@@ -131,27 +204,29 @@ def register_handlers(bot, kite):
             return
 
         symbol = parts[1].strip().upper()
-        excluded = load_excluded()
-        if symbol not in excluded:
+        with EXCLUDE_LOCK:
+            excluded = load_excluded()
+            was_excluded = symbol in excluded
+            if was_excluded:
+                excluded.remove(symbol)
+                save_excluded(excluded)
+
+        if was_excluded:
+            bot.reply_to(message, f"{symbol} has been included for trading.")
+        else:
             bot.reply_to(message, f"{symbol} was not in the exclude list.")
-            return
-
-        excluded.remove(symbol)
-        save_excluded(excluded)
-        bot.reply_to(message, f"{symbol} has been included for trading.")
 
     @bot.message_handler(commands=["tokenlink"])
     def cmd_tokenlink(message):
         try:
-            bot.reply_to(message, f"Login here: {kite.login_url()}")
+            bot.reply_to(message, f"Login here: {get_kite().login_url()}")
         except Exception:
             bot.reply_to(message, "Error generating token link.")
 
     @bot.message_handler(commands=["log"])
     def cmd_log(message):
         try:
-            with open(APP_LOG_FILE, "r", encoding="utf-8") as file_obj:
-                lines = file_obj.readlines()[-20:]
+            lines = tail_lines(APP_LOG_FILE, 20)
             log_text = "".join(lines) or "Log is empty."
             bot.reply_to(message, f"```\n{log_text}\n```", parse_mode="Markdown")
         except Exception:
@@ -168,12 +243,13 @@ def register_handlers(bot, kite):
     @bot.message_handler(commands=["exporttrades"])
     def cmd_exporttrades(message):
         try:
-            df = pd.read_json(TRADES_FILE, lines=True)
-            excel_path = LOG_DIR / "trades.xlsx"
-            df.to_excel(excel_path, index=False)
-            with open(TRADES_FILE, "rb") as json_file, open(excel_path, "rb") as excel_file:
-                bot.send_document(message.chat.id, json_file)
-                bot.send_document(message.chat.id, excel_file)
+            # Each export gets its own directory so concurrent requests never share a workbook
+            with tempfile.TemporaryDirectory(dir=LOG_DIR) as export_dir:
+                excel_path = Path(export_dir) / "trades.xlsx"
+                export_trades_xlsx(excel_path)
+                with open(TRADES_FILE, "rb") as json_file, open(excel_path, "rb") as excel_file:
+                    bot.send_document(message.chat.id, json_file)
+                    bot.send_document(message.chat.id, excel_file)
         except Exception:
             bot.reply_to(message, "Failed to export trades.")
 
@@ -188,12 +264,12 @@ def main():
         raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
 
     LOG_DIR.mkdir(parents=True, exist_ok=True)
-    kite = create_kite_client()
-    bot = telebot.TeleBot(TELEGRAM_TOKEN)
-    register_handlers(bot, kite)
+    get_kite()
+    bot = telebot.TeleBot(TELEGRAM_TOKEN, threaded=True, num_threads=4)
+    register_handlers(bot)
 
     logger.info("Telegram bot polling...")
-    bot.polling(non_stop=True, skip_pending=True)
+    bot.infinity_polling(skip_pending=True, timeout=30, long_polling_timeout=25)
 
 
 if __name__ == "__main__":
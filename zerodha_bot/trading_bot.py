@@ -1,25 +1,31 @@
 import argparse
+import atexit
 import datetime
-import json
 import logging
+import threading
 import time
 from pathlib import Path
 
+import orjson
 import pytz
-from kiteconnect import KiteConnect
+from kiteconnect import KiteConnect, KiteTicker
 
 try:
-    from .config import KITE_ACCESS_TOKEN, KITE_API_KEY, missing_env_vars
+    from .config import KITE_ACCESS_TOKEN, KITE_API_KEY, MISSING_KITE_ENV_VARS
+    from .file_utils import file_signature, load_json_file
 except ImportError:  # script execution fallback
-    from config import KITE_ACCESS_TOKEN, KITE_API_KEY, missing_env_vars
+    from config import KITE_ACCESS_TOKEN, KITE_API_KEY, MISSING_KITE_ENV_VARS
+    from file_utils import file_signature, load_json_file
 
 BASE_DIR = Path(__file__).resolve().parent
 LOG_DIR = BASE_DIR / "logs"
 PREDICTIONS_FILE = BASE_DIR / "predictions.json"
 EXCLUDE_FILE = BASE_DIR / "excluded.json"
+TRADES_FILE = LOG_DIR / "trades.jsonl"
 
 PROFIT_TARGET = 0.02  # 2% profit target
 STOP_LOSS = 0.01  # 1% stop loss
+TICK_SECONDS = 1  # exit-check interval while streaming prices
 
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 logging.basicConfig(
@@ -38,29 +44,40 @@ def load_predictions():
         return []
 
     try:
-        with open(PREDICTIONS_FILE, "r", encoding="utf-8") as file_obj:
-            data = json.load(file_obj)
+        data = load_json_file(PREDICTIONS_FILE)
     except Exception as exc:
         logger.error("Failed to read predictions file: %s", exc)
         return []
 
     stocks = data.get("stocks", [])
-    normalized = [symbol.strip().upper() for symbol in stocks if isinstance(symbol, str) and symbol.strip()]
-    return sorted(set(normalized))
+    return sorted({symbol.strip().upper() for symbol in stocks if isinstance(symbol, str) and symbol.strip()})
 
 
 def load_excluded_stocks():
+    """Return the excluded symbols, or None if the file exists but cannot be parsed."""
     if not EXCLUDE_FILE.exists():
         return set()
 
     try:
-        with open(EXCLUDE_FILE, "r", encoding="utf-8") as file_obj:
-            data = json.load(file_obj)
+        data = load_json_file(EXCLUDE_FILE)
         stocks = data.get("stocks", [])
         return {symbol.strip().upper() for symbol in stocks if isinstance(symbol, str) and symbol.strip()}
     except Exception as exc:
         logger.error("Failed to parse excluded symbols file: %s", exc)
-        return set()
+        return None
+
+
+_trades_file = None
+
+
+def _get_trades_file():
+    """Open the trade log once and keep it for the life of the process."""
+    global _trades_file
+    if _trades_file is None:
+        # Unbuffered so each entry reaches the file in a single write without reopening it
+        _trades_file = open(TRADES_FILE, "ab", buffering=0)
+        atexit.register(_trades_file.close)
+    return _trades_file
 
 
 def log_trade(action, symbol, quantity, price):
@@ -71,20 +88,29 @@ def log_trade(action, symbol, quantity, price):
         "quantity": quantity,
         "price": price,
     }
-    with open(LOG_DIR / "trades.jsonl", "a", encoding="utf-8") as file_obj:
-        file_obj.write(json.dumps(entry) + "\n")
+    _get_trades_file().write(orjson.dumps(entry) + b"\n")
 
 
 def create_kite_client():
-    missing = missing_env_vars("KITE_API_KEY", "KITE_ACCESS_TOKEN")
-    if missing:
-        raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
+    if MISSING_KITE_ENV_VARS:
+        raise RuntimeError(f"Missing required environment variables: {', '.join(MISSING_KITE_ENV_VARS)}")
 
     kite = KiteConnect(api_key=KITE_API_KEY)
     kite.set_access_token(KITE_ACCESS_TOKEN)
     return kite
 
 
+_kite_client = None
+
+
+def get_kite():
+    """Return the process-wide Kite client, creating it on first use."""
+    global _kite_client
+    if _kite_client is None:
+        _kite_client = create_kite_client()
+    return _kite_client
+
+
 def place_market_order(kite, symbol, quantity, transaction_type, dry_run):
     if dry_run:
         mock_order_id = f"dry-run-{transaction_type.lower()}-{symbol}-{int(time.time())}"
@@ -102,9 +128,153 @@ def place_market_order(kite, symbol, quantity, transaction_type, dry_run):
     )
 
 
-def run_trading_loop(kite, poll_seconds=30, max_cycles=None, dry_run=False):
+def fetch_last_prices(kite, symbols, instrument_tokens=None):
+    """Return {symbol: last_price} from one batched LTP call, retrying per symbol on failure."""
+    if not symbols:
+        return {}
+
+    # Prefer instrument tokens so the API does not have to resolve trading symbols
+    instrument_tokens = instrument_tokens or {}
+    instruments = {
+        str(instrument_tokens[symbol]) if symbol in instrument_tokens else f"NSE:{symbol}": symbol
+        for symbol in symbols
+    }
+    try:
+        quotes = kite.ltp(list(instruments))
+        return {
+            symbol: float(quotes[instrument]["last_price"])
+            for instrument, symbol in instruments.items()
+            if instrument in quotes
+        }
+    except Exception as exc:
+        logger.error("Batched price fetch failed, retrying per symbol: %s", exc)
+
+    prices = {}
+    for instrument, symbol in instruments.items():
+        try:
+            quote = kite.ltp([instrument])
+            prices[symbol] = float(quote[instrument]["last_price"])
+        except Exception as exc:
+            logger.error("Failed to fetch price for %s: %s", symbol, exc)
+    return prices
+
+
+def load_instrument_tokens(kite, symbols):
+    """Map each symbol to its NSE instrument token, or return {} if the dump is unavailable."""
+    wanted = set(symbols)
+    try:
+        instruments = kite.instruments("NSE")
+    except Exception as exc:
+        logger.error("Failed to fetch NSE instruments: %s", exc)
+        return {}
+
+    return {
+        row["tradingsymbol"]: row["instrument_token"]
+        for row in instruments
+        if row["segment"] == "NSE" and row["tradingsymbol"] in wanted
+    }
+
+
+class TickerPriceFeed:
+    """Keep the latest traded price of each symbol up to date from a KiteTicker websocket."""
+
+    def __init__(self, instrument_tokens):
+        self._tokens = list(instrument_tokens.values())
+        self._symbols_by_token = {token: symbol for symbol, token in instrument_tokens.items()}
+        self._prices = {}
+        self._connected = False
+        self._lock = threading.Lock()
+
+        self._ticker = KiteTicker(KITE_API_KEY, KITE_ACCESS_TOKEN)
+        self._ticker.on_connect = self._on_connect
+        self._ticker.on_ticks = self._on_ticks
+        self._ticker.on_error = self._on_error
+        self._ticker.on_close = self._on_close
+        self._ticker.on_reconnect = self._on_reconnect
+        self._ticker.on_noreconnect = self._on_noreconnect
+
+    @property
+    def connected(self):
+        return self._connected
+
+    def _on_connect(self, ws, response):
+        ws.subscribe(self._tokens)
+        ws.set_mode(ws.MODE_LTP, self._tokens)
+        self._connected = True
+        logger.info("Ticker connected, subscribed to %s instruments", len(self._tokens))
+
+    def _on_ticks(self, ws, ticks):
+        with self._lock:
+            for tick in ticks:
+                symbol = self._symbols_by_token.get(tick.get("instrument_token"))
+                if symbol is not None:
+                    self._prices[symbol] = float(tick["last_price"])
+
+    def _on_error(self, ws, code, reason):
+        logger.error("Ticker error %s: %s", code, reason)
+
+    def _on_close(self, ws, code, reason):
+        self._connected = False
+        with self._lock:
+            self._prices.clear()
+        logger.warning("Ticker closed (%s: %s), falling back to LTP polling", code, reason)
+
+    def _on_reconnect(self, ws, attempts_count):
+        logger.info("Ticker reconnecting (attempt %s)", attempts_count)
+
+    def _on_noreconnect(self, ws):
+        self._connected = False
+        logger.error("Ticker gave up reconnecting, continuing with LTP polling")
+
+    def start(self):
+        self._ticker.connect(threaded=True)
+
+    def stop(self):
+        self._ticker.close()
+
+    def last_prices(self, symbols):
+        """Return the last pushed price per symbol while connected; LTP mode only ticks on changes."""
+        if not self._connected:
+            return {}
+
+        with self._lock:
+            return {symbol: self._prices[symbol] for symbol in symbols if symbol in self._prices}
+
+
+def start_price_feed(instrument_tokens):
+    """Start streaming prices for the given tokens, or return None so the loop polls LTP instead."""
+    if not instrument_tokens:
+        return None
+
+    try:
+        price_feed = TickerPriceFeed(instrument_tokens)
+        price_feed.start()
+    except Exception as exc:
+        logger.error("Failed to start ticker, falling back to LTP polling: %s", exc)
+        return None
+    return price_feed
+
+
+def get_last_prices(kite, symbols, price_feed=None, instrument_tokens=None, use_rest=True):
+    """Combine streamed prices with a batched REST lookup for the rest, when use_rest is set."""
+    prices = price_feed.last_prices(symbols) if price_feed is not None else {}
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing and use_rest:
+        prices.update(fetch_last_prices(kite, missing, instrument_tokens))
+    return prices
+
+
+def run_trading_loop(
+    kite,
+    poll_seconds=30,
+    max_cycles=None,
+    dry_run=False,
+    price_feed=None,
+    instrument_tokens=None,
+):
     symbols_to_trade = load_predictions()
-    excluded_stocks = load_excluded_stocks()
+    excluded_signature = file_signature(EXCLUDE_FILE)
+    excluded_stocks = load_excluded_stocks() or set()
     open_trades = {}
 
     logger.info("Symbols to trade: %s", symbols_to_trade)
@@ -112,29 +282,56 @@ def run_trading_loop(kite, poll_seconds=30, max_cycles=None, dry_run=False):
     logger.info("Starting trading loop...")
 
     cycle_count = 0
+    next_poll_at = 0.0
     while True:
-        cycle_count += 1
+        # A cycle is one poll interval; streaming adds exit checks between polls without counting them
+        poll_due = time.monotonic() >= next_poll_at
+        if poll_due:
+            if max_cycles is not None and cycle_count >= max_cycles:
+                logger.info("Max cycles reached (%s), exiting trading loop", max_cycles)
+                break
+            next_poll_at = time.monotonic() + poll_seconds
+            cycle_count += 1
+
+        # Pick up /exclude and /include changes without re-parsing the file every cycle
+        current_signature = file_signature(EXCLUDE_FILE)
+        if current_signature != excluded_signature:
+            reloaded = load_excluded_stocks()
+            # On a parse error keep the previous list and retry on the next cycle
+            if reloaded is not None:
+                excluded_signature = current_signature
+                excluded_stocks = reloaded
+                logger.info("Excluded symbols updated: %s", sorted(excluded_stocks))
+
         now = datetime.datetime.now(TZ)
         current_time = now.time()
 
         if datetime.time(9, 30) <= current_time <= datetime.time(15, 15):
-            try:
-                margins = kite.margins(segment="equity")
-                wallet = float(margins.get("net", 0.0) or 0.0)
-            except Exception as exc:
-                logger.error("Failed to fetch margins: %s", exc)
-                wallet = 0.0
-
-            for symbol in symbols_to_trade:
-                if symbol in excluded_stocks or symbol in open_trades:
-                    continue
-
-                instrument = f"NSE:{symbol}"
+            # Entries and REST price lookups run once per poll; streamed exits are checked every tick
+            entry_symbols = []
+            if poll_due:
+                entry_symbols = [
+                    symbol
+                    for symbol in symbols_to_trade
+                    if symbol not in excluded_stocks and symbol not in open_trades
+                ]
+
+            wallet = 0.0
+            if entry_symbols:
                 try:
-                    quote = kite.ltp([instrument])
-                    last_price = float(quote[instrument]["last_price"])
+                    margins = kite.margins(segment="equity")
+                    wallet = float(margins.get("net", 0.0) or 0.0)
                 except Exception as exc:
-                    logger.error("Failed to fetch price for %s: %s", symbol, exc)
+                    logger.error("Failed to fetch margins: %s", exc)
+
+            prices = get_last_prices(
+                kite, entry_symbols + list(open_trades), price_feed, instrument_tokens, use_rest=poll_due
+            )
+
+            for symbol in entry_symbols:
+                last_price = prices.get(symbol)
+                if last_price is None:
+                    logger.error("No price available for %s", symbol)
                     continue
 
                 if wallet < last_price or last_price <= 0:
@@ -170,12 +367,11 @@ def run_trading_loop(kite, poll_seconds=30, max_cycles=None, dry_run=False):
                 target = trade_info["target"]
                 stop = trade_info["stop"]
 
-                instrument = f"NSE:{symbol}"
-                try:
-                    quote = kite.ltp([instrument])
-                    last_price = float(quote[instrument]["last_price"])
-                except Exception as exc:
-                    logger.error("Failed to fetch price for %s (exit check): %s", symbol, exc)
+                last_price = prices.get(symbol)
+                if last_price is None:
+                    # Between polls, symbols the ticker has not priced wait for the next REST lookup
+                    if poll_due:
+                        logger.error("No price available for %s (exit check)", symbol)
                     continue
 
                 should_exit = last_price >= target or last_price <= stop or current_time >= datetime.time(15, 10)
@@ -197,38 +393,46 @@ def run_trading_loop(kite, poll_seconds=30, max_cycles=None, dry_run=False):
 
                 open_trades.pop(symbol, None)
 
-            time.sleep(poll_seconds)
+            # Only tick fast while the socket is live; otherwise prices come from REST at the poll rate
+            streaming = price_feed is not None and price_feed.connected
+            time.sleep(TICK_SECONDS if streaming else poll_seconds)
         else:
             time.sleep(max(15, poll_seconds))
 
-        if max_cycles is not None and cycle_count >= max_cycles:
-            logger.info("Max cycles reached (%s), exiting trading loop", max_cycles)
-            break
-
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Run Zerodha intraday trading bot")
     parser.add_argument("--dry-run", action="store_true", help="Do not place real orders")
     parser.add_argument("--poll-seconds", type=int, default=30, help="Polling interval in seconds")
-    parser.add_argument("--max-cycles", type=int, default=None, help="Optional max loop cycles before exit")
+    parser.add_argument("--max-cycles", type=int, default=None, help="Optional max poll cycles before exit")
+    parser.add_argument("--no-ticker", action="store_true", help="Poll LTP instead of streaming ticks")
     return parser.parse_args()
 
 
 def main():
     args = parse_args()
+    price_feed = None
     try:
-        kite = create_kite_client()
+        kite = get_kite()
+        instrument_tokens = load_instrument_tokens(kite, load_predictions())
+        if not args.no_ticker:
+            price_feed = start_price_feed(instrument_tokens)
         run_trading_loop(
             kite=kite,
             poll_seconds=max(5, args.poll_seconds),
             max_cycles=args.max_cycles,
             dry_run=args.dry_run,
+            price_feed=price_feed,
+            instrument_tokens=instrument_tokens,
         )
     except KeyboardInterrupt:
         logger.info("Trading bot stopped by user.")
     except Exception as exc:
         logger.exception("Unexpected error in trading bot: %s", exc)
         raise
+    finally:
+        if price_feed is not None:
+            price_feed.stop()
 
 
 if __name__ == "__main__":